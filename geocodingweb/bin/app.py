@@ -1,3 +1,6 @@
+import os
+import threading
+import time
 import web
 from geocoding_data_tests import GeoCodingTest
 
@@ -11,6 +14,44 @@ urls = (
 app = web.application(urls, globals())
 render = web.template.render('templates/')
 
+# Loading the input data dominates the cost of a request, so the last GeoCodingTest
+# is shared between requests with the same parameters and data until it is this many
+# seconds old. A request with `refresh=1` always reloads the data.
+GEOCODING_CACHE_TTL = 300
+_geocoding_cache = {'params': None, 'instance': None, 'loaded_at': 0}
+_geocoding_lock = threading.Lock()
+
+def get_data_version(params):
+    """
+    Return a marker that changes when the input data is refreshed: the newest
+    modification time of the local CSVs. Postgres data has no such marker and
+    is only reloaded on expiry of the TTL or on request.
+    """
+    if params.get('input_type') != 'csv':
+        return None
+    in_dir = params.get('path_to_csv')
+    try:
+        return max(os.path.getmtime(os.path.join(in_dir, name)) for name in os.listdir(in_dir))
+    except (OSError, TypeError, ValueError):
+        return None
+
+def get_geocoding(params):
+    """
+    Return a GeoCodingTest for the request parameters, reusing the cached
+    instance while the parameters and data are unchanged, the TTL has not
+    expired and no refresh was requested.
+    """
+    params = dict(params)
+    refresh = params.pop('refresh', '0') not in ('', '0', 'false')
+    params_key = (tuple(sorted(params.items())), get_data_version(params))
+    with _geocoding_lock:
+        if (refresh or _geocoding_cache['instance'] is None or _geocoding_cache['params'] != params_key or
+                time.time() - _geocoding_cache['loaded_at'] > GEOCODING_CACHE_TTL):
+            _geocoding_cache['instance'] = GeoCodingTest(params)
+            _geocoding_cache['params'] = params_key
+            _geocoding_cache['loaded_at'] = time.time()
+        return _geocoding_cache['instance']
+
 class index(object):
     def GET(self):
         return render.geocoding()
@@ -18,19 +59,19 @@ class index(object):
 class testinvalidShape(object):
     def GET(self, test):
     	params  = web.input()
-    	geocoding = GeoCodingTest(params)
+    	geocoding = get_geocoding(params)
         return geocoding.test_invalidShape()
 
 class testoverlappingpolygons(object):
     def GET(self, test):
     	params  = web.input()
-    	geocoding = GeoCodingTest(params)
+    	geocoding = get_geocoding(params)
         return geocoding.test_overlappingPolygons()
 
 class testpointinpolygon(object):
     def GET(self, test):
     	params  = web.input()
-    	geocoding = GeoCodingTest(params)
+    	geocoding = get_geocoding(params)
         return geocoding.test_PointInPolygon()
 
 if __name__ == "__main__":
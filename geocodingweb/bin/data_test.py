@@ -33,10 +33,13 @@ import logging
 import os
 import sys
 import unittest
+from collections import defaultdict
+import numpy as np
 from tab_geocoding_test import readers
-from shapely.geometry import Polygon, shape
+from shapely.geometry import shape
 from shapely.ops import cascaded_union
-from shapely.geos import TopologicalError
+from shapely.prepared import prep
+from shapely.geos import TopologicalError, PredicateError
 
 class GeoTestBaseClass(unittest.TestCase):
 
@@ -44,8 +47,9 @@ class GeoTestBaseClass(unittest.TestCase):
     Base class which populates a list attribute `self.csv_test_data` with
     records from the local csv directory.
     """
-    # Uncomment and run with `nosetests --verbose --processes=N
-    # _multiprocess_shared_ = True
+    # Every test loads its own data in setUp, so nose may hand the test methods
+    # of a class to separate processes: `nosetests --verbose --processes=N`
+    _multiprocess_can_split_ = True
     def setUp(self):
         """
         Load records from a local CSV output.
@@ -53,10 +57,13 @@ class GeoTestBaseClass(unittest.TestCase):
         """
         self.logger = logging.getLogger(name=__name__)
         self.logger.setLevel( logging.DEBUG )
-        hdlr = logging.FileHandler('out.log')
-        formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-        hdlr.setFormatter(formatter)
-        self.logger.addHandler(hdlr)
+        # setUp runs before every test; only attach the file handler once per
+        # process so log lines are not written once per previous test.
+        if not self.logger.handlers:
+            hdlr = logging.FileHandler('out.log')
+            formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+            hdlr.setFormatter(formatter)
+            self.logger.addHandler(hdlr)
 
         self.logger.info("Setting up environment for tests...")
 
@@ -72,21 +79,53 @@ class GeoTestBaseClass(unittest.TestCase):
         # Do not overwrite output.
         self.longMessage = True
 
+        # Point coordinates are gathered in the same pass so the point tests
+        # can be evaluated as array operations instead of per-point shapely calls.
+        point_xs = []
+        point_ys = []
+        point_rows = []
+        # Property columns, one entry per row of self.test_data, so tests can
+        # filter records with array masks.
+        ids = []
+        map_codes = []
+        classes = []
+        none_values = []
+        for row, record in enumerate(self.test_data):
+            properties = record['properties']
+            ids.append(properties['id'])
+            map_codes.append(properties['map_code'])
+            classes.append(properties['class'])
+            none_values.append(properties['none'])
+            if 'geometry' in record:
+                for geom in record['geometry']['geometries']:
+                    if geom['type'] == 'Point':
+                        point_xs.append(geom['coordinates'][0])
+                        point_ys.append(geom['coordinates'][1])
+                        point_rows.append(row)
+
+        self.point_xs = np.asarray(point_xs, dtype=np.float64)
+        self.point_ys = np.asarray(point_ys, dtype=np.float64)
+        # Row index into self.test_data of the record each point belongs to.
+        self.point_rows = np.asarray(point_rows, dtype=np.intp)
+        self.ids = np.asarray(ids)
+        self.map_codes = np.asarray(map_codes)
+        self.classes = np.asarray(classes)
+        self.none_values = np.asarray(none_values, dtype=object)
+
+        # Test the uniqueness of the compound primary key id and map code.
+        # Sorting both key columns once places any duplicates next to each other.
+        order = np.lexsort((self.map_codes, self.ids))
+        sorted_ids = self.ids[order]
+        sorted_map_codes = self.map_codes[order]
+        is_duplicate = (sorted_ids[1:] == sorted_ids[:-1]) & (sorted_map_codes[1:] == sorted_map_codes[:-1])
+        duplicate_keys = sorted(set(zip(sorted_ids[1:][is_duplicate].tolist(),
+                                        sorted_map_codes[1:][is_duplicate].tolist())))
+        self.assertEqual(len(duplicate_keys), 0, msg="Records already exist with the compound primary keys %s"
+                                                     % self._format_comp_keys(duplicate_keys))
+
         #place holder for input data to be stored with id as keys in the dictionary
         # for faster look ups based on ids
-        # it also takes care of testing the uniquness of the compund
-        # primary key id and map code
-        self.id_indexed_record = {}
-        for record in self.test_data:
-            if record.has_key('properties'):
-                if not self.id_indexed_record.has_key(str(record['properties']['id']) +
-                '_' + str(record['properties']['map_code'])):
-                    self.id_indexed_record[str(record['properties']['id']) +
-                    '_' + str(record['properties']['map_code'])] = record
-                else:
-                    failure_message = "Record already exists with the compound primary key {0}_{1}".format(str(record['properties']['id']),
-                        str(record['properties']['map_code']))
-                    self.assertFalse(True, msg=failure_message)
+        self.id_indexed_record = dict(zip(zip(ids, map_codes), self.test_data))
 
         # IDs identified with Invalid polygon shapes
         self.ids_with_invalid_shapes = []
@@ -121,10 +160,22 @@ class GeoTestBaseClass(unittest.TestCase):
                 staging_prefixes=staging_prefixes
             )
             # Create test data lists
-            return pg_geocoding_conn
+            return [r for r in pg_geocoding_conn]
         else:
             return None
 
+    def _get_comp_primary_key(self, record):
+        """
+        Private method to get the (id, map_code) compound key from the imput data
+        """
+        return (record['properties']['id'], record['properties']['map_code'])
+
+    def _format_comp_keys(self, comp_keys):
+        """
+        Private method to format compound keys as id_map_code strings for failure messages
+        """
+        return ["{0}_{1}".format(*comp_key) for comp_key in comp_keys]
+
 class TestProperties(GeoTestBaseClass):
     """
     Perform tests specific to properties for geocodable entities.
@@ -138,27 +189,19 @@ class TestProperties(GeoTestBaseClass):
         emit a record for the above classes in the event that postgres has a Null value
         or empty string in the `None` column.
         """
-        none_isNoneString = []
-        none_isEmptyString = []
-        for record in self.test_data:
-            # Test applies only to specific classes.
-            if record['properties']['class'] in (100, 101):
-
-                none_val = record['properties']['none']
-                # Check for Python NoneType in `none` column. Funny, right?
-                if none_val == 'None':
-                    composite_key = self._get_comp_primary_key(record)
-                    none_isNoneString.append(composite_key)
-
-                # Check for an empty string.
-                if none_val == '':
-                    composite_key = self._get_comp_primary_key(record)
-                    none_isEmptyString.append(composite_key)
+        # Test applies only to specific classes.
+        single_name_class = np.in1d(self.classes, (100, 101))
+        # Check for Python NoneType in `none` column. Funny, right?
+        none_isNoneString = [self._get_comp_primary_key(self.test_data[row])
+                             for row in np.flatnonzero(single_name_class & (self.none_values == 'None'))]
+        # Check for an empty string.
+        none_isEmptyString = [self._get_comp_primary_key(self.test_data[row])
+                              for row in np.flatnonzero(single_name_class & (self.none_values == ''))]
 
         self.assertEqual(len(none_isNoneString), 0, msg="The following features are expected to have a valid value"
-                                                      " in the `none` column, but have a string with a value of None: %s" % none_isNoneString)
+                                                      " in the `none` column, but have a string with a value of None: %s" % self._format_comp_keys(none_isNoneString))
         self.assertEqual(len(none_isEmptyString), 0, msg="The following features are expected to have a valid value"
-                                                         " in the `none` column, but have an empty string: %s" % none_isEmptyString)
+                                                         " in the `none` column, but have an empty string: %s" % self._format_comp_keys(none_isEmptyString))
 
 class TestGeometries(GeoTestBaseClass):
     """
@@ -169,53 +212,30 @@ class TestGeometries(GeoTestBaseClass):
         """
         Test to ensure that every Postgres feature has a point geometry within a WGS84 BBOX.
         """
-        world_bbox = Polygon([(-180, 90), (180, 90), (180, -90), (-180, -90)])
-        features_no_points = []
-        for record in self.test_data:
-            # Iterate through a feature's geometries, check for point attr,
-            # then check for population of point attr
-            has_valid_point = False
-            if 'geometry' in record.keys():
-                for geom in record['geometry']['geometries']:
-                    if geom['type'] == 'Point':
-                        # Check point is within WGS84 BBOX
-                        shapely_pt = shape(geom)
-                        if world_bbox.intersects(shapely_pt):
-                            has_valid_point = True
-            # if we have no point or an invalid point, flag it.
-            if not has_valid_point:
-                composite_key = self._get_comp_primary_key(record)
-                features_no_points.append(composite_key)
+        xs = self.point_xs
+        ys = self.point_ys
+        # Check every point against the WGS84 BBOX at once.
+        valid_mask = (xs >= -180) & (xs <= 180) & (ys >= -90) & (ys <= 90)
+        # A record passes if at least one of its points is valid.
+        has_valid_point = np.zeros(len(self.test_data), dtype=bool)
+        has_valid_point[self.point_rows[valid_mask]] = True
+        # if we have no point or an invalid point, flag it.
+        features_no_points = [self._get_comp_primary_key(self.test_data[row])
+                              for row in np.flatnonzero(~has_valid_point)]
 
         # Raise error if we don't have an empty error list
-        self.assertEqual(len(features_no_points), 0, msg="The following features have invalid point geometries %s" % features_no_points)
+        self.assertEqual(len(features_no_points), 0, msg="The following features have invalid point geometries %s" % self._format_comp_keys(features_no_points))
 
     def test_HasNoPointsOnNullIsland(self):
         """
         Test to ensure there is no points on null island
         """
-        features_on_null_island = []
-        for record in self.test_data:
-            # pull down from database
-            # Iterate through the points
-            # inside iteration, check if it is on null island
-            null_island_point = False
-            if 'geometry' in record.keys():
-                for geom in record['geometry']['geometries']:
-                    if geom['type'] == 'Point':
-                        # Check point is not on null island
-                        # Convert point to shapely geom
-                        shapely_pt = shape(geom)
-                        # Coordinate values are accessed from the coords object
-                        # using 'list'
-                        if list(shapely_pt.coords) == [(0.0, 0.0)]:
-                            null_island_point = True
-            # if there is a point on null island, flag it.
-            if null_island_point:
-                composite_key = self._get_comp_primary_key(record)
-                features_on_null_island.append(composite_key)
+        on_null_island = (self.point_xs == 0) & (self.point_ys == 0)
+        # if there is a point on null island, flag it.
+        features_on_null_island = [self._get_comp_primary_key(self.test_data[row])
+                                   for row in np.unique(self.point_rows[on_null_island])]
         #Raise Error
-        self.assertEqual(len(features_on_null_island), 0, msg="The following features have point geometries on null island %s" % features_on_null_island)
+        self.assertEqual(len(features_on_null_island), 0, msg="The following features have point geometries on null island %s" % self._format_comp_keys(features_on_null_island))
 
     def test_PointInPolygonGeom(self):
         """
@@ -224,27 +244,21 @@ class TestGeometries(GeoTestBaseClass):
         """
         features_point_outside_polygon = []
         for record in self.test_data:
-            geoms = record['geometry']['geometries']
-            pt_geom = None
-            poly_geom = None
-            # Check for presence of point and polygon geoms.
-            for geom in geoms:
-                if geom['type'] == 'Point':
-                    pt_geom = shape(geom)
-                if geom['type'] in ('MultiPolygon', 'Polygon'):
-                    poly_geom = shape(geom)
+            poly_geom = self._get_Polygon(record)
+            # Features without a polygon are skipped, so only build their point when needed.
+            pt_geom = self._get_Point(record) if poly_geom else None
             if pt_geom and poly_geom:
                 # Check if point is within polygon. If not, flag it.
                 try:
                     if not pt_geom.within(poly_geom):
                         composite_key = self._get_comp_primary_key(record)
                         features_point_outside_polygon.append(composite_key)
-                except Exception as e:
+                except (TopologicalError, PredicateError) as e:
                     continue
 
         # Raise error if we don't have an empty error list
         self.assertEqual(len(features_point_outside_polygon), 0,
-                         msg="The following features have point geoms outside of polygon geoms %s" % features_point_outside_polygon)
+                         msg="The following features have point geoms outside of polygon geoms %s" % self._format_comp_keys(features_point_outside_polygon))
 
     def test_overlappingPolygons(self):
         """
@@ -252,46 +266,48 @@ class TestGeometries(GeoTestBaseClass):
         """
         #Build a spatial index based on the bounding boxes of the polygons
         from rtree import index
-        idx = index.Index()
-        count = -1
-        #iterating through input data to index
-        polygon_shapes = []
+        # Only polygons of the same class and map code are compared, so bucket
+        # them first and index each bucket on its own.
+        buckets = defaultdict(list)
         self.logger.info("Building the spatial index based on bounding boxes...")
         for record in self.test_data:
-            if 'geometry' in record.keys():
-                geoms = record['geometry']['geometries']
-                # Check for presence of polygon geoms.
-                for geom in geoms:
-                    if geom['type'] in ('MultiPolygon', 'Polygon'):
-                        class_mapcode_polygons = {'id': record['properties']['id'],
-                        'class': record['properties']['class'],
-                        'map_code': record['properties']['map_code'],
-                        'polygon': shape(geom)}
-                        polygon_shapes.append(class_mapcode_polygons)
-                        count +=1
-                        idx.insert(count, shape(geom).bounds)
+            polygon = self._get_Polygon(record)
+            # Check for presence of polygon geoms.
+            if polygon is not None:
+                class_mapcode_polygons = {'id': record['properties']['id'],
+                'map_code': record['properties']['map_code'],
+                'polygon': polygon}
+                bucket_key = (record['properties']['class'], record['properties']['map_code'])
+                buckets[bucket_key].append(class_mapcode_polygons)
 
         #check for overapping polygons
-        features_with_overlapping_polygons = []
+        # Pairs are stored in sorted order so each feature pair is only reported once.
+        overlapping_pairs = set()
         ids_with_topology_error = []
         self.logger.info("Verifying overlapping polygons...")
-        chumma_count = 0
-        for data in polygon_shapes:
-            for key in idx.intersection(data['polygon'].bounds):
-                if(data['map_code'] == polygon_shapes[key]['map_code'] and
-                    data['class'] == polygon_shapes[key]['class'] and
-                    polygon_shapes[key]['polygon'] != data['polygon']):
+        for polygon_shapes in buckets.itervalues():
+            # A polygon alone in its bucket has nothing to overlap with.
+            if len(polygon_shapes) < 2:
+                continue
+            # Each bounding box is computed once and streamed into the constructor,
+            # so rtree bulk-loads a packed index instead of inserting one at a time.
+            bounds = [data['polygon'].bounds for data in polygon_shapes]
+            idx = index.Index((count, bbox, None) for count, bbox in enumerate(bounds))
+
+            for i, data in enumerate(polygon_shapes):
+                for key in idx.intersection(bounds[i]):
+                    # Every pair is found from both sides; only check it from the lower index.
+                    if key <= i:
+                        continue
+                    feature_1 = (polygon_shapes[key]['id'], polygon_shapes[key]['map_code'])
+                    feature_2 = (data['id'], data['map_code'])
                     #verifying overlap
                     try:
-                        feature_1 = str(polygon_shapes[key]['id']) + '_' + str(polygon_shapes[key]['map_code'])
-                        feature_2 = str(data['id']) + '_' + str(data['map_code'])
                         if polygon_shapes[key]['polygon'].overlaps(data['polygon']):
-
-                            if feature_2 + ";" + feature_1 not in features_with_overlapping_polygons:
-                                features_with_overlapping_polygons.append(feature_1 + ";" + feature_2)
-                    except Exception as e:
+                            overlapping_pairs.add(tuple(sorted((feature_1, feature_2))))
+                    except (TopologicalError, PredicateError) as e:
                         error_dict = {
-                            'composite_keys': feature_1 + ";" + feature_2,
+                            'composite_keys': ";".join(self._format_comp_keys((feature_1, feature_2))),
                             'error_string': str(e)
                             }
                         ids_with_topology_error.append(error_dict)
@@ -301,6 +317,7 @@ class TestGeometries(GeoTestBaseClass):
         if len(ids_with_topology_error) is not 0:
             self._print_ids_with_topology_error("These are a list of IDs that have TopologicalErrors that COULD NOT be checked for overlaps",
                 ids_with_topology_error)
+        features_with_overlapping_polygons = [";".join(self._format_comp_keys(pair)) for pair in sorted(overlapping_pairs)]
         # Raise error if we don't have an empty error list
         self.assertEqual(len(features_with_overlapping_polygons), 0,
                          msg="The following features have overlapping polygons %s" % features_with_overlapping_polygons)
@@ -311,21 +328,36 @@ class TestGeometries(GeoTestBaseClass):
         """
         features_polygon_falls_within_parent = []
         ids_with_topology_error = []
+        # Parents are shared by many children, so each parent polygon is prepared
+        # once and reused for every `contains` check against it. Only valid parents
+        # are prepared and only valid children checked against them; the rest go
+        # through the plain predicate, whose errors are recorded below.
+        prepared_parents = {}
         for record in self.test_data:
             child_polygon = self._get_Polygon(record)
             # checking is the record is not a country for csv data
             if child_polygon is not None and record['properties']['class'] is not 0:
-                index_key = str(record['properties']['parent_id']) + "_" + str(record['properties']['map_code'])
-                if self.id_indexed_record.has_key(index_key):
-                    parent_polygon = self._get_Polygon(self.id_indexed_record[index_key])
+                index_key = (record['properties']['parent_id'], record['properties']['map_code'])
+                if index_key in self.id_indexed_record:
+                    if index_key not in prepared_parents:
+                        parent_polygon = self._get_Polygon(self.id_indexed_record[index_key])
+                        parent_prepared = None
+                        if parent_polygon is not None and parent_polygon.is_valid:
+                            parent_prepared = prep(parent_polygon)
+                        prepared_parents[index_key] = (parent_polygon, parent_prepared)
+                    parent_polygon, parent_prepared = prepared_parents[index_key]
                     if parent_polygon is not None:
                         # verifying if the child polygon intersects with the parent polygon
                         try:
-                            if not parent_polygon.contains(child_polygon):
-                                features_polygon_falls_within_parent.append(str(record['properties']['id']) + "_" + str(record['properties']['map_code']))
-                        except Exception as e:
+                            if parent_prepared is not None and child_polygon.is_valid:
+                                contained = parent_prepared.contains(child_polygon)
+                            else:
+                                contained = parent_polygon.contains(child_polygon)
+                            if not contained:
+                                features_polygon_falls_within_parent.append(self._get_comp_primary_key(record))
+                        except (TopologicalError, PredicateError) as e:
                             error_dict = {
-                            'composite_key': str(record['properties']['id']) + "_" + str(record['properties']['map_code']),
+                            'composite_key': "{0}_{1}".format(*self._get_comp_primary_key(record)),
                             'error_string': str(e)
                             }
                             ids_with_topology_error.append(error_dict)
@@ -341,7 +373,7 @@ class TestGeometries(GeoTestBaseClass):
                 ids_with_topology_error)
         # Raise error if we don't have an empty error list
         self.assertEqual(len(features_polygon_falls_within_parent), 0,
-                         msg="The following features have polygon that does not fall within its parent %s" % features_polygon_falls_within_parent)
+                         msg="The following features have polygon that does not fall within its parent %s" % self._format_comp_keys(features_polygon_falls_within_parent))
 
     def test_invalidShape(self):
         """
@@ -350,7 +382,6 @@ class TestGeometries(GeoTestBaseClass):
         b. self intersecting polygon_shapes
         c. minimum area
         """
-        print "=======================sadfasfsdfafd===================="
         features_invalid_shape = []
         for record in self.test_data:
             polygon = self._get_Polygon(record)
@@ -362,27 +393,35 @@ class TestGeometries(GeoTestBaseClass):
 
         # Raise error if we don't have an empty error list
         self.assertEqual(len(features_invalid_shape), 0,
-                         msg="The following features have invalid polygon shape %s" % features_invalid_shape)
+                         msg="The following features have invalid polygon shape %s" % self._format_comp_keys(features_invalid_shape))
+
+    def _get_Point(self, record):
+        """
+        Private method to get the point shape object from the imput data
+        """
+        return self._get_cached_shape(record, '_point', ('Point',))
 
     def _get_Polygon(self, record):
         """
         Private method to get the shape object from the imput data
         """
-        if 'geometry' in record.keys():
-            geoms = record['geometry']['geometries']
-            for geom in geoms:
-                if geom['type'] in ('MultiPolygon', 'Polygon'):
-                    return shape(geom)
-                else:
-                    return None
-        else:
-            return None
+        return self._get_cached_shape(record, '_polygon', ('MultiPolygon', 'Polygon'))
 
-    def _get_comp_primary_key(self, record):
+    def _get_cached_shape(self, record, cache_key, geom_types):
         """
-        Private method to get id_map_code from the imput data
+        Private method to get the shape of the first geometry of the given types.
+        The shape is cached on the record under `cache_key`, so tests sharing a
+        record only build it once.
         """
-        return str(record['properties']['id']) + "_" + str(record['properties']['map_code'])
+        if cache_key not in record:
+            record[cache_key] = None
+            if 'geometry' in record.keys():
+                geoms = record['geometry']['geometries']
+                for geom in geoms:
+                    if geom['type'] in geom_types:
+                        record[cache_key] = shape(geom)
+                        break
+        return record[cache_key]
 
     def _print_ids_with_topology_error(self, message, records):
         """
@@ -4,15 +4,16 @@ import os
 import sys
 import readers
 import json
+from collections import defaultdict
 from shapely.geometry import Polygon, shape
-from shapely.ops import cascaded_union
-from shapely.geos import TopologicalError
+from shapely.prepared import prep
+from shapely.geos import TopologicalError, PredicateError
 
 class GeoCodingTest():
 
     """
-    Base class which populates a list attribute `self.csv_test_data` with
-    records from the local csv directory.
+    Base class which reads records from the configured data source once and
+    keeps them, with the fields the tests use, as parallel columns by row.
     """
     # Uncomment and run with `nosetests --verbose --processes=N
     # _multiprocess_shared_ = True
@@ -23,10 +24,13 @@ class GeoCodingTest():
         """
         self.logger = logging.getLogger(name=__name__)
         self.logger.setLevel( logging.DEBUG )
-        hdlr = logging.FileHandler('out.log')
-        formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-        hdlr.setFormatter(formatter)
-        self.logger.addHandler(hdlr)
+        # The web app creates an instance per data source; only attach the file
+        # handler once per process so each log line is not written once per instance.
+        if not self.logger.handlers:
+            hdlr = logging.FileHandler('out.log')
+            formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+            hdlr.setFormatter(formatter)
+            self.logger.addHandler(hdlr)
 
         self.logger.info("Setting up environment for tests...")
 
@@ -46,32 +50,23 @@ class GeoCodingTest():
                     self.user_config.set('user_postgres_settings', 'pg_password', params['password'])
                     self.user_config.set('user_postgres_settings', 'pg_staging_prefixes', params['staging_prefix'])
 
-        self.test_data = self.get_input_data()
-        #self.assertIsNotNone(self.test_data, "Incorrect data type given: Data type in config should be 'csv'/'postgres'.")
+        records = self.get_input_data()
+        #self.assertIsNotNone(records, "Incorrect data type given: Data type in config should be 'csv'/'postgres'.")
 
         # Append value of assert's `msg` parameter to end of normal failure output
         # Do not overwrite output.
         self.longMessage = True
 
-        #place holder for input data to be stored with id as keys in the dictionary
-        # for faster look ups based on ids
-        # it also takes care of testing the uniquness of the compund
-        # primary key id and map code
-        self.id_indexed_record = {}
-        for record in self.test_data:
-            if record.has_key('properties'):
-                if not self.id_indexed_record.has_key(str(record['properties']['id']) +
-                '_' + str(record['properties']['map_code'])):
-                    self.id_indexed_record[str(record['properties']['id']) +
-                    '_' + str(record['properties']['map_code'])] = record
-                else:
-                    failure_message = "Record already exists with the compound primary key {0}_{1}".format(str(record['properties']['id']),
-                        str(record['properties']['map_code']))
-                    print failure_message
-
         # IDs identified with Invalid polygon shapes
         self.ids_with_invalid_shapes = []
 
+        # Everything the tests need is built once per instance, so repeated checks on
+        # the same data (the web app reuses instances across requests) share it.
+        self._prepare(records)
+
+        # Validity flag per row, computed on first use.
+        self._invalid = None
+
     def get_input_data(self):
         """
         Helper method to return the input data based on data type
@@ -84,8 +79,8 @@ class GeoCodingTest():
                 in_dir=self.user_config.get('user_csv_settings', 'local_csv_path')
             )
 
-            # Create test data lists
-            return [r for r in local_csv_conn]
+            # The reader itself is returned; _prepare consumes it in one pass.
+            return local_csv_conn
 
         #loads test data from postgres
         elif(self.data_type == 'postgres'):
@@ -101,7 +96,7 @@ class GeoCodingTest():
                 host=self.user_config.get('user_postgres_settings', 'pg_host'),
                 staging_prefixes=staging_prefixes
             )
-            # Create test data lists
+            # The reader itself is returned; _prepare consumes it in one pass.
             return pg_geocoding_conn
         else:
             return None
@@ -113,17 +108,17 @@ class GeoCodingTest():
         b. self intersecting polygon_shapes
         c. minimum area
         """
+        invalid = self._get_invalid()
+
+        records = self._records
+        ids = self._ids
+        comp_keys = self._comp_keys
         features_invalid_shape = {}
-        for record in self.test_data:
-            geoms = record['geometry']['geometries']
-            polygon = self._get_Polygon(record)
-            if polygon is not None:
-                # is_invalid considers OpenGIS Implementation Specification for Geographic information - Simple feature access
-                # http://toblerity.org/shapely/manual.html#id22
-                if not polygon.is_valid:
-                    if record['properties']['id'] not in features_invalid_shape:
-                        features_invalid_shape[record['properties']['id']] = record
-        json_data = json.dumps(features_invalid_shape)
+        for row, is_invalid in enumerate(invalid):
+            if is_invalid and comp_keys[row] is not None:
+                if ids[row] not in features_invalid_shape:
+                    features_invalid_shape[ids[row]] = records[row]
+        json_data = self._to_json(features_invalid_shape)
         return json_data
 
     def test_PointInPolygon(self):
@@ -132,106 +127,207 @@ class GeoCodingTest():
         NOTE: A feature that does not contain a polygon geometry will be skipped.
         """
         features_point_outside_polygon = {}
-        for record in self.test_data:
-            geoms = record['geometry']['geometries']
-            pt_geom = None
-            poly_geom = None
-            # Check for presence of point and polygon geoms.
-            for geom in geoms:
-                if geom['type'] == 'Point':
-                    pt_geom = shape(geom)
-                if geom['type'] in ('MultiPolygon', 'Polygon'):
-                    poly_geom = shape(geom)
+        points = self._points
+        polygons = self._polygons
+        geoms = self._geoms
+        comp_keys = self._comp_keys
+        for row, pt_geom in enumerate(points):
+            poly_geom = polygons[row]
             if pt_geom and poly_geom:
                 # Check if point is within polygon. If not, flag it.
                 try:
                     if not pt_geom.within(poly_geom):
-                        composite_key = self._get_comp_primary_key(record)
-                        features_point_outside_polygon[composite_key] = geoms
-                except Exception as e:
+                        features_point_outside_polygon[comp_keys[row]] = geoms[row]
+                except (TopologicalError, PredicateError) as e:
                     continue
 
-        json_data = json.dumps(features_point_outside_polygon)
+        json_data = self._to_json(dict((self._format_comp_key(comp_key), geometries)
+                                       for comp_key, geometries in features_point_outside_polygon.iteritems()))
         return json_data
 
     def test_overlappingPolygons(self):
         """
         Test to ensure there are No two polygons of same Class and Mapcode overlay
         """
-        #Build a spatial index based on the bounding boxes of the polygons
-        from rtree import index
-        idx = index.Index()
-        count = -1
-        #iterating through input data to index
-        polygon_shapes = []
-        self.logger.info("Building the spatial index based on bounding boxes...")
-        for record in self.test_data:
-            if 'geometry' in record.keys():
-                geoms = record['geometry']['geometries']
-                # Check for presence of polygon geoms.
-                for geom in geoms:
-                    if geom['type'] in ('MultiPolygon', 'Polygon'):
-                        class_mapcode_polygons = {'id': record['properties']['id'],
-                        'class': record['properties']['class'],
-                        'map_code': record['properties']['map_code'],
-                        'polygon': shape(geom),
-                        'geoms':geoms}
-                        polygon_shapes.append(class_mapcode_polygons)
-                        count +=1
-                        idx.insert(count, shape(geom).bounds)
+        classes = self._classes
+        map_codes = self._map_codes
+        comp_keys = self._comp_keys
+        geoms = self._geoms
+        polygons = self._polygons
+        bounds = self._bounds
+        bucket_indexes = self._rtree_indexes
+        invalid = self._get_invalid()
 
         #check for overapping polygons
         features_with_overlapping_polygons = {}
         ids_with_topology_error = []
         self.logger.info("Verifying overlapping polygons...")
-        chumma_count = 0
-        for data in polygon_shapes:
-            for key in idx.intersection(data['polygon'].bounds):
-                if(data['map_code'] == polygon_shapes[key]['map_code'] and
-                    data['class'] == polygon_shapes[key]['class'] and
-                    polygon_shapes[key]['polygon'] != data['polygon']):
-                    #verifying overlap
-                    try:
-                        feature_1 = str(polygon_shapes[key]['id']) + '_' + str(polygon_shapes[key]['map_code'])
-                        feature_2 = str(data['id']) + '_' + str(data['map_code'])
-                        if polygon_shapes[key]['polygon'].overlaps(data['polygon']):
-
-                            if not features_with_overlapping_polygons.has_key(feature_2 + ";" + feature_1):
-                                print "++++++++++++++++++++++++++"
-                                print polygon_shapes[key]['geoms']
-                                print data['geoms']
-                                print "++++++++++++++++++++++++++"
-                                features_with_overlapping_polygons[feature_1 + ";" + feature_2]["type"] = "GeometryCollection"
-                                features_with_overlapping_polygons[feature_1 + ";" + feature_2]["geometries"] = polygon_shapes[key]['geoms']
-                                #features_with_overlapping_polygons[feature_1 + ";" + feature_2]  = polygon_shapes[key]['geoms']
-                                features_with_overlapping_polygons[feature_1 + ";" + feature_2]["geometries"].append(data['geoms'])
-                    except Exception as e:
-                        error_dict = {
-                            'composite_keys': feature_1 + ";" + feature_2,
-                            'error_string': str(e)
-                            }
-                        ids_with_topology_error.append(error_dict)
-                        continue
-
-        json_data = json.dumps(features_with_overlapping_polygons)
+        for i, polygon in enumerate(polygons):
+            if polygon is None:
+                continue
+            # Polygons alone in their (class, map_code) bucket have no index to query.
+            idx = bucket_indexes.get((classes[i], map_codes[i]))
+            if idx is None:
+                continue
+            feature_2 = comp_keys[i]
+            # The probe polygon is tested against every candidate in its bounds, so it
+            # is prepared once, on the first candidate, to speed up repeated predicates.
+            # Prepared predicates cannot report errors on invalid polygons, so pairs with
+            # one use the plain predicate.
+            prepared_polygon = None
+            for key in idx.intersection(bounds[i]):
+                # Index positions are rows. Skipping the polygon itself and every row
+                # before it visits each unordered pair exactly once.
+                if key <= i:
+                    continue
+                feature_1 = comp_keys[key]
+                #verifying overlap
+                try:
+                    if invalid[i] or invalid[key]:
+                        overlapping = polygon.overlaps(polygons[key])
+                    else:
+                        if prepared_polygon is None:
+                            prepared_polygon = prep(polygon)
+                        overlapping = prepared_polygon.overlaps(polygons[key])
+                    if overlapping:
+                        # The geometries themselves are part of the returned JSON. The logger is
+                        # set to DEBUG in __init__, so every overlap is also written to out.log.
+                        self.logger.debug("Overlapping polygons: %s;%s",
+                                          self._format_comp_key(feature_1), self._format_comp_key(feature_2))
+                        # Copy the geometries so the record's own list is left untouched.
+                        entry = features_with_overlapping_polygons.setdefault((feature_1, feature_2), {
+                            "type": "GeometryCollection",
+                            "geometries": list(geoms[key])
+                            })
+                        entry["geometries"].extend(geoms[i])
+                except (TopologicalError, PredicateError) as e:
+                    error_dict = {
+                        'composite_keys': ";".join(self._format_comp_key(k) for k in (feature_1, feature_2)),
+                        'error_string': str(e)
+                        }
+                    ids_with_topology_error.append(error_dict)
+                    continue
+
+        # Pairs of compound keys are only formatted as strings for the JSON output.
+        json_data = self._to_json(dict((";".join(self._format_comp_key(k) for k in pair), collection)
+                                       for pair, collection in features_with_overlapping_polygons.iteritems()))
         return json_data
 
+    def _build_spatial_index(self, buckets, bounds):
+        """
+        Private method to build a spatial index based on the bounding boxes of the
+        polygons in the input data.
+        :param buckets: A dict of the rows holding a polygon, per (class, map_code).
+        :param bounds: The list of polygon bounds per row.
+        :return: A dict of rtree indexes over the rows, one per (class, map_code)
+                 bucket holding at least two polygons.
+        """
+        from rtree import index
+        self.logger.info("Building the spatial index based on bounding boxes...")
+
+        # The indexes are never modified after loading, so pack the nodes densely.
+        properties = index.Property(leaf_capacity=100, fill_factor=0.9)
+        bucket_indexes = {}
+        for bucket, members in buckets.iteritems():
+            # A polygon alone in its bucket has nothing to overlap with.
+            if len(members) < 2:
+                continue
+            # Stream the bounds into the constructor so rtree bulk-loads the index.
+            bucket_indexes[bucket] = index.Index(((row, bounds[row], None) for row in members),
+                                                 properties=properties)
+        return bucket_indexes
+
+    def _to_json(self, data):
+        """
+        Private method to serialize a test result. The results carry full geometries,
+        so the separators are kept compact to avoid padding every coordinate pair.
+        """
+        return json.dumps(data, separators=(',', ':'))
+
     def _get_comp_primary_key(self, record):
         """
-        Private method to get id_map_code from the imput data
+        Private method to get the (id, map_code) tuple from the imput data
         """
-        return str(record['properties']['id']) + "_" + str(record['properties']['map_code'])
+        return (record['properties']['id'], record['properties']['map_code'])
 
-    def _get_Polygon(self, record):
+    def _format_comp_key(self, comp_key):
         """
-        Private method to get the shape object from the imput data
+        Private method to format an (id, map_code) tuple as id_map_code for output
+        """
+        return "{0}_{1}".format(*comp_key)
+
+    def _prepare(self, records):
         """
-        if 'geometry' in record.keys():
-            geoms = record['geometry']['geometries']
-            for geom in geoms:
-                if geom['type'] in ('MultiPolygon', 'Polygon'):
-                    return shape(geom)
+        Private method to consume the input data in a single pass. Records are kept in
+        parallel lists aligned with their order, which the tests look up by row: record,
+        id, class, map_code, compound primary key, geometries, polygon and point shape
+        and polygon bounds. Duplicate compound primary keys are logged as they are read.
+        Shapes and bounds are None where the record has none; points are only shaped
+        for records that also have a polygon, as they are only ever tested against it.
+        The spatial index is built from the same pass.
+        :param records: An iterable of records, as returned by get_input_data.
+        """
+        records_list = []
+        ids = []
+        classes = []
+        map_codes = []
+        comp_keys = []
+        geoms_list = []
+        polygons = []
+        points = []
+        bounds = []
+        seen_keys = set()
+        # Only polygons of the same class and map_code are compared, so each bucket
+        # gets its own index and candidates from a query never need filtering again.
+        buckets = defaultdict(list)
+        for row, record in enumerate(records):
+            properties = record.get('properties', {})
+            composite_key = None
+            if 'properties' in record:
+                composite_key = self._get_comp_primary_key(record)
+                if composite_key in seen_keys:
+                    failure_message = "Record already exists with the compound primary key {0}".format(self._format_comp_key(composite_key))
+                    self.logger.warning(failure_message)
                 else:
-                    return None
-        else:
-            return None
\ No newline at end of file
+                    seen_keys.add(composite_key)
+            geoms = record['geometry']['geometries'] if 'geometry' in record else []
+            # Take the first polygon, whatever position it holds in the collection.
+            polygon = next((shape(geom) for geom in geoms if geom['type'] in ('MultiPolygon', 'Polygon')), None)
+            point = None
+            polygon_bounds = None
+            if polygon is not None:
+                point = next((shape(geom) for geom in geoms if geom['type'] == 'Point'), None)
+                polygon_bounds = polygon.bounds
+                buckets[(properties.get('class'), properties.get('map_code'))].append(row)
+            records_list.append(record)
+            ids.append(properties.get('id'))
+            classes.append(properties.get('class'))
+            map_codes.append(properties.get('map_code'))
+            comp_keys.append(composite_key)
+            geoms_list.append(geoms)
+            polygons.append(polygon)
+            points.append(point)
+            bounds.append(polygon_bounds)
+
+        self._records = records_list
+        self._ids = ids
+        self._classes = classes
+        self._map_codes = map_codes
+        self._comp_keys = comp_keys
+        self._geoms = geoms_list
+        self._polygons = polygons
+        self._points = points
+        self._bounds = bounds
+        self._rtree_indexes = self._build_spatial_index(buckets, bounds)
+
+    def _get_invalid(self):
+        """
+        Private method to get the validity flag of every row's polygon.
+        :return: A list aligned with the rows, True where the record has an invalid polygon.
+        """
+        if self._invalid is None:
+            # is_invalid considers OpenGIS Implementation Specification for Geographic information - Simple feature access
+            # http://toblerity.org/shapely/manual.html#id22
+            # The shapes never change, so validity is only evaluated once per instance.
+            self._invalid = [polygon is not None and not polygon.is_valid for polygon in self._polygons]
+        return self._invalid
\ No newline at end of file
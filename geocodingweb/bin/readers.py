@@ -63,16 +63,41 @@ An example feature:
 """
 __author__ = 'mkenny'
 import abc
+import codecs
 import csv
 import itertools
 import os
 import psycopg2
-import simplejson
 import sys
-from collections import Counter
+from collections import defaultdict
 from psycopg2.extras import RealDictCursor
 from psycopg2 import ProgrammingError
-from shapely import wkt, geometry, speedups
+from shapely import wkb, wkt, geometry, speedups
+
+# The Python 2 csv module only reads bytes, so text fields are decoded by hand.
+# Resolving the codec once skips the codec registry lookup of str.decode per field.
+_utf8_decode = codecs.getdecoder('utf-8')
+
+# Properties of a feature before any source has populated them. Readers copy this
+# per record rather than rebuilding the dict literal for every row.
+_EMPTY_PROPERTIES = {
+    'none': None,
+    'fr_fr': None,
+    'pt_br': None,
+    'zh_cn': None,
+    'ko_kr': None,
+    'iso3': None,
+    'map_code': None,
+    'id': None,
+    'ja_jp': None,
+    'synonyms': None,
+    'iso2': None,
+    'fips': None,
+    'parent_id': None,
+    'de_de': None,
+    'es_es': None,
+    'class': None,
+    'en_us': None}
 
 
 class ReaderBaseClass(object):
@@ -114,11 +139,15 @@ class ReaderLocalCSVs(ReaderBaseClass):
     Point and Polygon geometries.
 
     :param in_dir: A pathway to a directory containing local csv files.
+    :param buffer_size: Size in bytes of the read buffer used for each csv file.
     """
 
-    def __init__(self, in_dir):
+    def __init__(self, in_dir, buffer_size=4 * 1024 * 1024):
         # path to CSV directory
         self.in_dir = in_dir
+        # Polygon WKT fields make the files large, so read them in big chunks
+        # rather than with the default 8KB buffer.
+        self.buffer_size = buffer_size
         self.file_structure = {
             'AreaCode': {'class_id': 101, 'files': ['AreaCode.csv', 'LocalDataAreaCode.csv']},
             'County': {'class_id': 2, 'files': ['CountySynonyms.csv', 'LocalDataCounty.csv', 'County.csv']},
@@ -144,15 +173,11 @@ class ReaderLocalCSVs(ReaderBaseClass):
         :param in_dir: Path to local CSV directory.
         :return:  True if all required files are present. Exception if not.
         """
-        # Create a list of files in self.file_structure.
-        required_files = [v['files'] for k, v in self.file_structure.iteritems()]
-        required_files_flattened = [file_name for file_list in required_files for file_name in file_list]
+        # Create a set of files in self.file_structure.
+        required_files = set(file_name for v in self.file_structure.itervalues() for file_name in v['files'])
 
-        # Create a list of files in user-provided directory.
-        files_in_dir = os.listdir(in_dir)
-
-        # Check if all required files are present in given directory using set intersection.
-        if set(required_files_flattened).issubset(set(files_in_dir)):
+        # Check if all required files are present in the user-provided directory.
+        if required_files.issubset(set(os.listdir(in_dir))):
             return True
         else:
             raise Exception('Error: Missing Expected CSV file.')
@@ -183,76 +208,130 @@ class ReaderLocalCSVs(ReaderBaseClass):
         return a generator which yields a single combined row as GeoJSON.
 
         :param class_name: The name of the class for which this generated will emit records for.
-        :param csv_records: A dictionary of CSV records parsed from user-provided directory.
+        :param csv_records: A dictionary of row generators over the CSV files of the class, as
+                            returned by self._read_csv(). Each generator emits its header first.
         """
         # Store our geojson output for the class
         geojson_output = {}
-
-        for record in csv_records['named']:
-            out_record = {
-                'type': 'feature',
-                'properties': {
-                    'map_code': int(record['MapCode']),
-                    'parent_id': record['ParentID'],
-                    'id': int(record['ID']),
-                    'class': self.file_structure[class_name]['class_id'],
-                    'fips': None, 'iso2': None, 'iso3': None,
-                    'de_de': None, 'en_us': None, 'es_es': None,
-                    'fr_fr': None, 'ja_jp': None, 'ko_kr': None,
-                    'pt_br': None, 'zh_cn': None, 'none': None,
-                    'synonyms': None
-                }
-            }
+        class_id = self.file_structure[class_name]['class_id']
+
+        named_rows = csv_records['named']
+        columns = self._column_positions(named_rows)
+        id_i = columns.get('ID')
+        map_code_i = columns.get('MapCode')
+        parent_id_i = columns.get('ParentID')
+        name_i = columns.get('Name')
+        fips_i = columns.get('FIPS')
+        iso2_i = columns.get('ISO3166_2')
+        iso3_i = columns.get('ISO3166_3')
+        for row in named_rows:
+            properties = _EMPTY_PROPERTIES.copy()
+            properties['map_code'] = int(row[map_code_i])
+            properties['id'] = int(row[id_i])
+            properties['class'] = class_id
 
             # Convert parent_id to int. Use a python `None` if an empty string is encountered.
-            if out_record['properties']['parent_id']:
+            parent_id = row[parent_id_i]
+            if parent_id:
                 try:
-                    out_record['properties']['parent_id'] = int(out_record['properties']['parent_id'])
+                    parent_id = int(parent_id)
                 except ValueError as e:
-                    out_record['properties']['parent_id'] = None
+                    parent_id = None
+            properties['parent_id'] = parent_id
 
-            if 'Name' in record.keys():
+            if name_i is not None:
                 # For certain geocoding classes, the `none` values
                 # is represented in the CSVs as `Name`.
-                out_record['properties']['none'] = record['Name'].decode('utf-8')
+                properties['none'] = _utf8_decode(row[name_i])[0]
 
             # The Country.csv file has extra name fields.
-            if 'FIPS' in record.keys():
-                out_record['properties']['fips'] = record['FIPS'].decode('utf-8')
-                out_record['properties']['iso2'] = record['ISO3166_2'].decode('utf-8')
-                out_record['properties']['iso3'] = record['ISO3166_3'].decode('utf-8')
+            if fips_i is not None:
+                properties['fips'] = _utf8_decode(row[fips_i])[0]
+                properties['iso2'] = _utf8_decode(row[iso2_i])[0]
+                properties['iso3'] = _utf8_decode(row[iso3_i])[0]
 
-            # assign this record back to staging dict.
-            geojson_output[record['compound_key']] = out_record
+            out_record = {
+                'type': 'feature',
+                'properties': properties
+            }
 
-        for record in csv_records['local']:
-            out_record = {'type': 'GeometryCollection', 'geometries': []}
+            # assign this record back to staging dict, under its compound primary key.
+            geojson_output[(row[id_i], row[map_code_i])] = out_record
+
+        local_rows = csv_records['local']
+        columns = self._column_positions(local_rows)
+        map_code_i = columns.get('MapCode')
+        parent_id_i = columns.get('ParentID')
+        geometry_i = columns.get('Geometry')
+        longitude_i = columns.get('Longitude')
+        latitude_i = columns.get('Latitude')
+        for row in local_rows:
+            geometries = []
             # Geometry is the name of field containing multipolygon wkt
-            if 'Geometry' in record and record['Geometry'] != 'None':
-                polygon = geometry.mapping(wkt.loads(record['Geometry']))
-                out_record['geometries'].append(polygon)
-            point = {'type': 'Point', 'coordinates': [float(record['Longitude']), float(record['Latitude'])]}
-            out_record['geometries'].append(point)
+            if geometry_i is not None and row[geometry_i] != 'None':
+                geometries.append(geometry.mapping(wkt.loads(row[geometry_i])))
+            geometries.append({'type': 'Point', 'coordinates': [float(row[longitude_i]), float(row[latitude_i])]})
+            out_record = {'type': 'GeometryCollection', 'geometries': geometries}
             # append out_record to geojson_ouput dict
-            geojson_output[record['compound_key']]['geometry'] = out_record
+            geojson_output[(row[parent_id_i], row[map_code_i])]['geometry'] = out_record
 
         if csv_records['synonyms']:
-            for record in csv_records['synonyms']:
+            synonym_rows = csv_records['synonyms']
+            columns = self._column_positions(synonym_rows)
+            map_code_i = columns.get('MapCode')
+            parent_id_i = columns.get('ParentID')
+            name_i = columns.get('Name')
+            locale_i = columns.get('Locale')
+            is_display_name_i = columns.get('IsDisplayName')
+            for row in synonym_rows:
                 # Begin adding properties.
-                rec_props = geojson_output[record['compound_key']]['properties']
-                if record['IsDisplayName'] == '1':
-                    locale = record['Locale'].lower()
-                    rec_props[locale] = record['Name'].decode('utf-8')
+                rec_props = geojson_output[(row[parent_id_i], row[map_code_i])]['properties']
+                name = _utf8_decode(row[name_i])[0]
+                if row[is_display_name_i] == '1':
+                    locale = row[locale_i].lower()
+                    rec_props[locale] = name
                 else:
-                    # We have a synonym
-                    if rec_props['synonyms'] is None:
-                        rec_props['synonyms'] = []
-                    rec_props['synonyms'].append(record['Name'].decode('utf-8'))
+                    # We have a synonym. Records without any keep `None`, so the list
+                    # is only created with the first one.
+                    synonyms = rec_props['synonyms']
+                    if synonyms is None:
+                        synonyms = rec_props['synonyms'] = []
+                    synonyms.append(name)
 
         # Create the generator
         for record in geojson_output.itervalues():
             yield record
 
+    def _column_positions(self, rows):
+        """
+        Consume the header emitted first by a generator from self._read_csv()
+        and map each column name to its position in the following rows.
+
+        :param rows: A generator returned by self._read_csv().
+        :return: A dict of column name to column index. Empty for an empty file.
+        """
+        return dict((name, i) for i, name in enumerate(next(rows, [])))
+
+    def _read_csv(self, file_path):
+        """
+        Return a generator over the rows of a pipe-delimited CSV file. Rows are emitted as
+        plain lists, read lazily while the file is consumed; the header row comes first so
+        column positions can be resolved once per file. Blank lines are skipped, as
+        csv.DictReader did.
+
+        :param file_path: Path to the CSV file.
+        :return: A generator emitting the header followed by each row of the file.
+        """
+        with open(file_path, 'rb', self.buffer_size) as in_file:
+            reader = csv.reader(in_file, delimiter='|', quoting=csv.QUOTE_NONE)
+            try:
+                for row in reader:
+                    if not row:
+                        continue
+                    yield row
+            except Exception as e:
+                print e
+
     def _get_class_generator(self, in_dir, class_name, class_attributes):
         """
         Return a generator returning geojson records
@@ -263,41 +342,26 @@ class ReaderLocalCSVs(ReaderBaseClass):
         :param class_attributes: A dictionary containing the class' numerical code (e.g. 0,1,2,10, etc.) and file names.
         :return: Returns a generator emitting assembled records for that class.
         """
-        # Data structure to store records from each file of the class
+        # Data structure to store the row generator of each file of the class
         records_from_files = {
             'named': None,
             'local': None,
             'synonyms': None
         }
 
-        # Iterate through each file adding contents to records_from_files
+        # Iterate through each file adding a row generator to records_from_files.
+        # Files are only opened and read once the class' records are consumed.
         for file_name in class_attributes['files']:
             file_path = os.path.join(in_dir, file_name)
-            with open(file_path) as in_file:
-                # Determine file 'type'
-                if 'Synonyms' in file_name:
-                    file_type = 'synonyms'
-                elif 'Local' in file_name:
-                    file_type = 'local'
-                else:
-                    file_type = 'named'
-
-                # Create a csv reader and a list to store extracted records.
-                reader = csv.DictReader(in_file, delimiter='|', quoting=csv.QUOTE_NONE)
-                records_from_files[file_type] = []
+            # Determine file 'type'
+            if 'Synonyms' in file_name:
+                file_type = 'synonyms'
+            elif 'Local' in file_name:
+                file_type = 'local'
+            else:
+                file_type = 'named'
+            records_from_files[file_type] = self._read_csv(file_path)
 
-                try:
-                    for record in reader:
-                        # Create a single attribute representing the compound primary key.
-                        if file_type == 'named':
-                            record['compound_key'] = record['ID'] + '_' + record['MapCode']
-                        else:
-                            record['compound_key'] = record['ParentID'] + '_' + record['MapCode']
-                        records_from_files[file_type].append(record)
-                except Exception as e:
-                    print e
-
-        #print records_from_files
         # This returns a generator for that class.
         return self._records_for_class_to_geojson(class_name, records_from_files)
 
@@ -321,8 +385,8 @@ def generate_select_statements(staging_prefix=None):
         'features': ["SELECT id, parent_id, class, map_code FROM ", "features"],
         'names': ["SELECT de_de, es_es, fr_fr, ja_jp, ko_kr, pt_br, zh_cn, none, id, map_code, fips, iso2, iso3 FROM ", "names"],
         'synonyms': ["SELECT name, map_code, id FROM ", "synonyms"],
-        'points': ["SELECT id, map_code, ST_AsGeoJSON(the_geom) as pt_geom FROM ", "points"],
-        'polygons': ["SELECT id, map_code, ST_AsGeoJSON(the_geom) as pl_geom FROM ", "polygons"]
+        'points': ["SELECT id, map_code, ST_AsBinary(the_geom) as pt_geom FROM ", "points"],
+        'polygons': ["SELECT id, map_code, ST_AsBinary(the_geom) as pl_geom FROM ", "polygons"]
     }
 
     # If a staging prefix was given, alter table names to reflect staging tables.
@@ -354,10 +418,12 @@ class ReaderPostgres(ReaderBaseClass):
     :param password: Password for DB user. Defaults to None.
     :param host: Host name, defaults to `pgsqlgis-repos`.
     :param port: Port number, defaults to 5432.
+    :param itersize: Rows fetched per round trip from server-side cursors, defaults to 50000.
+                     Pass None to use regular client-side cursors.
     """
 
     def __init__(self, query=None, staging_prefixes=None, database='pg_geocoding', user='test_user',
-                 password=None, host='pgsqlgis-repos', port=5432, **kwargs):
+                 password=None, host='pgsqlgis-repos', port=5432, itersize=50000, **kwargs):
 
         self.conn_params = {
             'database': database,
@@ -379,10 +445,16 @@ class ReaderPostgres(ReaderBaseClass):
         else:
             self.staging_prefixes = []
 
+        self.itersize = itersize
+        speedups.enable()
+
         # Entry Point for creation of merged set of staging/production records, if needed.
-        self._production_data = self.query_datasets(self._conn_handler)
-        self._staging_datasets = [self.query_datasets(self._conn_handler, prefix) for prefix in self.staging_prefixes]
-        self._output_records_iterable = self._generate_output_iterable(self._production_data, self._staging_datasets)
+        # Staging datasets are queried one at a time as they are merged, and only the
+        # assembled features are kept on the instance, so raw table rows can be released.
+        production_data = self.query_datasets(self._conn_handler, itersize=self.itersize)
+        staging_datasets = (self.query_datasets(self._conn_handler, prefix, self.itersize)
+                            for prefix in self.staging_prefixes)
+        self._output_records_iterable = self._generate_output_iterable(production_data, staging_datasets)
 
     @classmethod
     def open_connection(self, conn_params):
@@ -398,7 +470,7 @@ class ReaderPostgres(ReaderBaseClass):
         return conn
 
     @classmethod
-    def execute_query(self, db_conn, query, query_params=None):
+    def execute_query(self, db_conn, query, query_params=None, name=None, itersize=None):
         """
         Return a cursor with result set from self.query. See psycopg2 docs for query param syntax.
         http://initd.org/psycopg/docs/usage.html#passing-parameters-to-sql-queries
@@ -406,11 +478,15 @@ class ReaderPostgres(ReaderBaseClass):
         :param db_conn: A Psycopg2 connection object.
         :param query: A string representing a query to be executed.
         :param query_params: A tuple or dictionary of parameters to be passed to the sql query. See link in description.
+        :param name: Optional cursor name. A named cursor is executed server side and streams its rows.
+        :param itersize: Number of rows a named cursor fetches per network round trip.
 
         :return: Returns a cursor with the query results.
         """
         # Create cursor with Unicode support and Execute Query
-        cur = db_conn.cursor()
+        cur = db_conn.cursor(name=name)
+        if name and itersize:
+            cur.itersize = itersize
         psycopg2.extensions.register_type(psycopg2.extensions.UNICODE, cur)
         cur.execute(query, query_params)
         return cur
@@ -424,32 +500,29 @@ class ReaderPostgres(ReaderBaseClass):
         :param table_name: The table being checked.
         :return: Returns data input if keys are validated.
         """
-        # Check that keys are present for a given record, create list of compound primary keys.
-        compound_keys = []
+        # Check that keys are present for a given record, collecting compound primary keys
+        # as tuples in a single pass. Keys seen a second time are duplicates.
+        seen_keys = set()
+        duplicate_keys = set()
         for row in in_data:
+            compound_key = tuple(row[key] for key in keys)
             # Check that key values exist.
-            print row
-            for key in keys:
-                print "======================================"
-                print key
-                print "======================================"
-                if row[key] is None or row[key] == '':
+            for value in compound_key:
+                if value is None or value == '':
                     raise ValueError("Record in table '%s' has an un-populated key field: %s" % (table_name, keys))
-            # Add compound key to list of keys.
-            compound_key = '_'.join(str(row[key]) for key in keys)
-            compound_keys.append(compound_key)
-
-        key_count = Counter(compound_keys)
-        # Get the most count of the most common key (it's the form of a tuple (value, cnt))
-        if key_count.most_common(1)[0][1] != 1:
-            key_count_list = key_count.items()
-            duplicate_keys = [key[0] for key in key_count_list if key[1] > 1]
+            if compound_key in seen_keys:
+                duplicate_keys.add(compound_key)
+            else:
+                seen_keys.add(compound_key)
+
+        if duplicate_keys:
+            duplicate_keys = ['_'.join(str(value) for value in key) for key in duplicate_keys]
             raise ValueError("Duplicate keys found in %s table of staging "
                              "or production data. Dup Keys are: %s" % (table_name, duplicate_keys))
         return in_data
 
     @classmethod
-    def query_datasets(self, db_conn, staging_prefix=None):
+    def query_datasets(self, db_conn, staging_prefix=None, itersize=None):
         """
         Given a connection handler to the postgres database, Execute a series of queries to
         return these data (production or staging) as a dict whose keys represent table names
@@ -458,6 +531,8 @@ class ReaderPostgres(ReaderBaseClass):
 
         :param db_conn: An open connection to Postgres via Psycopg2.
         :param staging_prefix: Optional staging prefix name, used to query staging tables.
+        :param itersize: Optional batch size. When given, rows are streamed through server-side cursors
+                         instead of the whole result set being buffered client side first.
         :return: A dict representing data from data from the various tables representing a geocoding entity.
         """
         # Generate SELECT Statements for tables.
@@ -467,16 +542,17 @@ class ReaderPostgres(ReaderBaseClass):
         table_results = {}
         try:
             for table_name, table_query in table_queries.iteritems():
-                table_cursor = self.execute_query(db_conn, table_query)
+                cursor_name = None
+                if itersize:
+                    cursor_name = '_'.join(['geo_stream', staging_prefix or 'production', table_name])
+                table_cursor = self.execute_query(db_conn, table_query, name=cursor_name, itersize=itersize)
                 # Extract Data, Validate Keys
                 table_data = [row for row in table_cursor]
+                table_cursor.close()
                 # Note key validation is not applicable to synonyms,
                 # which has valid duplicate id+mapcode combinations.
                 # Nor is it applicable to empty tables.
                 if table_name != 'synonyms' and len(table_data) > 0:
-                    print "======================================"
-                    print table_name
-                    print "======================================"
                     self.validate_keys(table_data, table_name)
                 table_results[table_name] = table_data
 
@@ -493,28 +569,26 @@ class ReaderPostgres(ReaderBaseClass):
         """
         Given a dataset formatted as output from self.query_datasets(),
         transform the dict values into a dict whose keys represent the compound
-        primary identifier for a geocoding feature <id_mapcode>.
+        primary identifier for a geocoding feature, as an (id, map_code) tuple.
         :param in_dataset: Dictionary formatted from self.query_datasets()
-        :return: A dataset with whose values have been transformed into dicts with <id_mapcode> keys
+        :return: A dataset with whose values have been transformed into dicts with (id, map_code) keys
         """
         transformed_data = {}
         for table_name, table_values in in_dataset.iteritems():
             transformed_table = {}
             if table_name == 'synonyms':
                 # Since synonyms have valid multiple records of the same key combo
-                # Need to append their values to a list.
+                # Need to append their values to a list, created with the first value.
+                # Note: the table is only ever iterated or merged with setdefault(), so
+                # missing keys are never materialized by lookups.
+                transformed_table = defaultdict(list)
                 for record in table_values:
-                    compound_key = str(record['id']) + '_' + str(record['map_code'])
-                    # If key exists, append to list; if not, append a new list with first value.
-                    if compound_key in transformed_table:
-                        transformed_table[compound_key].append(record)
-                    else:
-                        transformed_table[compound_key] = [record]
+                    transformed_table[(record['id'], record['map_code'])].append(record)
             else:
                 # Since we've checked key integrity for non-synonym tables in self.validate_keys()
                 # Assume a key combo exists in a table only once.
                 for record in table_values:
-                    compound_key = str(record['id']) + '_' + str(record['map_code'])
+                    compound_key = (record['id'], record['map_code'])
                     transformed_table[compound_key] = record
             # Assign data back out.
             transformed_data[table_name] = transformed_table
@@ -536,21 +610,19 @@ class ReaderPostgres(ReaderBaseClass):
 
         # Update dictionary of production hash with data from merge hash
         # Synonym tables will need to be handled separately.
-        for table_name in in_production_hash.iterkeys():
+        for table_name, production_table in in_production_hash.iteritems():
+            # Note: This assumes `in_merge_hash has at least a dict key for each table`
+            merge_table = in_merge_hash[table_name]
+            if not merge_table:
+                continue
             if table_name != 'synonyms':
-                # Note: This assumes `in_merge_hash has at least a dict key for each table`
-                in_production_hash[table_name].update(in_merge_hash[table_name])
+                production_table.update(merge_table)
             else:
                 # Synonyms are represented as a list of rows, rather then a single row.
                 # Need to append to list rather then overwrite existing entries.
-                for synonym_id, synonym_value in in_merge_hash[table_name].iteritems():
-                    # Update
-                    if synonym_id in in_production_hash[table_name]:
-                        production_synonyms = in_production_hash[table_name][synonym_id]
-                        in_production_hash[table_name][synonym_id] = production_synonyms + synonym_value
-                    # Insert
-                    else:
-                        in_production_hash[table_name][synonym_id] = synonym_value
+                # The lists are built per key by dataset_to_hash_map(), so extending in place is safe.
+                for synonym_id, synonym_value in merge_table.iteritems():
+                    production_table.setdefault(synonym_id, []).extend(synonym_value)
         # return merged dataset
         return in_production_hash
 
@@ -559,62 +631,52 @@ class ReaderPostgres(ReaderBaseClass):
         Given a dict of Psycopg2 RealDictCursor rows for geocoding tables,
         assemble these into a single GeoJSON-like feature.
         :param in_data_hash:
-        :return: A list of assembled GeoJSON-like dicts.
+        :return: A view over the assembled GeoJSON-like dicts, which can be iterated repeatedly.
         """
         records_as_geojson = {}
 
         for table_name, table_data in in_data_hash.iteritems():
             for row_id, row_data in table_data.iteritems():
                 # Check for presence of record insert template if none exists.
-                if row_id not in records_as_geojson:
+                record = records_as_geojson.get(row_id)
+                if record is None:
                     # Add new record
-                    records_as_geojson[row_id] = {
+                    properties = _EMPTY_PROPERTIES.copy()
+                    # Each record needs lists of its own, never shared through the template.
+                    properties['synonyms'] = []
+                    record = records_as_geojson[row_id] = {
                     'geometry': {'type': 'GeometryCollection',
                                  'geometries': []},
                     'type': 'Feature',
-                    'properties': {
-                        'none': None,
-                        'fr_fr': None,
-                        'pt_br': None,
-                        'zh_cn': None,
-                        'ko_kr': None,
-                        'iso3': None,
-                        'map_code': None,
-                        'id': None,
-                        'ja_jp': None,
-                        'synonyms': [],
-                        'iso2': None,
-                        'fips': None,
-                        'parent_id': None,
-                        'de_de': None,
-                        'es_es': None,
-                        'class': None,
-                        'en_us': None}
+                    'properties': properties
                     }
+                properties = record['properties']
                 # Push row into GeoJSON Template.
-                if table_name in ['points', 'polygons']:
+                if table_name in ('points', 'polygons'):
                     # Place geoms into geometry collection dict
-                    records_as_geojson[row_id]['properties']['id'] = row_data.pop('id')
-                    records_as_geojson[row_id]['properties']['map_code'] = row_data.pop('map_code')
+                    properties['id'] = row_data.pop('id')
+                    properties['map_code'] = row_data.pop('map_code')
 
                     # At this point, on the single geom object (pt_geom or pl_geom) to be loaded.
+                    # Geometries arrive as WKB, which GEOS parses without a text scan.
+                    geometries = record['geometry']['geometries']
                     for geom in row_data.itervalues():
-                        geom_obj = simplejson.loads(geom)
-                        records_as_geojson[row_id]['geometry']['geometries'].append(geom_obj)
+                        geometries.append(geometry.mapping(wkb.loads(bytes(geom))))
 
-                elif table_name in ['synonyms']:
+                elif table_name == 'synonyms':
                     if len(row_data) > 0:
                         # create a list of synonyms values
                         synonyms_values = [row['name'] for row in row_data]
                         # Place synonyms into list.
-                        records_as_geojson[row_id]['properties']['synonyms'] = synonyms_values
-                        records_as_geojson[row_id]['properties']['id'] = row_data[0]['id']
-                        records_as_geojson[row_id]['properties']['map_code'] = row_data[0]['map_code']
+                        properties['synonyms'] = synonyms_values
+                        properties['id'] = row_data[0]['id']
+                        properties['map_code'] = row_data[0]['map_code']
                 else:
                     # Add keys into properties dict
-                    records_as_geojson[row_id]['properties'].update(row_data)
+                    properties.update(row_data)
 
-        return records_as_geojson.values()
+        # A view rather than .values(), which would copy every feature into a new list.
+        return records_as_geojson.viewvalues()
 
     def _generate_output_iterable(self, production_data, staging_datasets=None):
         """
@@ -622,7 +684,7 @@ class ReaderPostgres(ReaderBaseClass):
         emit GeoJSON-like dicts for production data with staging data applied (if applicable).
 
         :param production_data: A dict containing geocoding table names that can be aggregated into GeoJSON-like features.
-        :param staging_datasets: A list of dicts that can be applied to the production data after conversion to GeoJSON-like format.
+        :param staging_datasets: An iterable of dicts that can be applied to the production data after conversion to GeoJSON-like format.
         :return: An iterable of merged data (if applicable).
         """
         # Convert All Datasets into "Hashed Representation"